@@ -0,0 +1,797 @@
+"""
+In-memory aggregate cube for the E-Commerce dashboard
+Builds compact NumPy arrays from the ECOM tables once per data version, so
+every dashboard view is answered by vectorized slicing and summation instead
+of SQL.
+
+Usage:
+    python ecom_cube.py rebuild      # rebuild and save the cube file
+    python ecom_cube.py footprint    # memory used by each dimension and measure
+    python ecom_cube.py verify       # check every view against the SQL it replaces
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+CUBE_FILE = os.environ.get('CUBE_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                     'ecom_cube.npz'))
+
+# Measures filling less than this fraction of their cells are stored sparse
+SPARSE_DENSITY = 0.25
+
+ORDER_DIMS = ('month', 'state', 'status')
+
+# The dashboard's SQL, keyed by view name. The cube answers the same views.
+VIEW_QUERIES = {
+    'total_customers': "SELECT COUNT(customer_id) as total_customers FROM customers",
+    'unique_orders': "SELECT COUNT(DISTINCT order_id) as total_orders FROM orders",
+    'order_records': "SELECT COUNT(*) as total_records FROM orders",
+    'total_revenue': "SELECT ROUND(SUM(payment_value)::NUMERIC, 2) as total_revenue FROM payments",
+    'active_customers': "SELECT COUNT(DISTINCT customer_id) FROM orders",
+    'avg_order_value': "SELECT ROUND(AVG(payment_value)::NUMERIC, 2) FROM payments",
+    'orders_per_customer': """
+        SELECT ROUND((COUNT(DISTINCT order_id) * 1.0 / COUNT(DISTINCT customer_id))::NUMERIC, 2)
+        FROM orders
+    """,
+    'total_products': "SELECT COUNT(DISTINCT product_id) FROM products",
+    'duplicate_factor': """
+        SELECT ROUND((COUNT(*) * 1.0 / COUNT(DISTINCT order_id))::NUMERIC, 1) as dup_factor
+        FROM orders
+    """,
+    'customers_by_state': """
+        SELECT customer_state, COUNT(*) as customer_count
+        FROM customers
+        GROUP BY customer_state
+        ORDER BY customer_count DESC
+        LIMIT 10
+    """,
+    'orders_by_status': """
+        SELECT order_status, COUNT(DISTINCT order_id) as count
+        FROM orders
+        GROUP BY order_status
+        ORDER BY count DESC
+    """,
+    'orders_by_month': """
+        SELECT
+            TO_CHAR(order_purchase_timestamp::TIMESTAMP, 'YYYY-MM') as month,
+            COUNT(DISTINCT order_id) as order_count
+        FROM orders
+        GROUP BY TO_CHAR(order_purchase_timestamp::TIMESTAMP, 'YYYY-MM')
+        ORDER BY month
+    """,
+    'category_revenue': """
+        SELECT
+            p."product category" as category,
+            ROUND(SUM(pay.payment_value)::NUMERIC, 2) as total_revenue
+        FROM products p
+        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN payments pay ON oi.order_id = pay.order_id
+        GROUP BY p."product category"
+        ORDER BY total_revenue DESC
+        LIMIT 10
+    """,
+    'monthly_revenue': """
+        SELECT
+            TO_CHAR(o.order_purchase_timestamp::TIMESTAMP, 'YYYY-MM') as month,
+            ROUND(SUM(p.payment_value)::NUMERIC, 2) as monthly_revenue,
+            COUNT(DISTINCT o.order_id) as order_count
+        FROM (SELECT DISTINCT order_id, order_purchase_timestamp FROM orders) o
+        JOIN payments p ON o.order_id = p.order_id
+        GROUP BY TO_CHAR(o.order_purchase_timestamp::TIMESTAMP, 'YYYY-MM')
+        ORDER BY month
+    """,
+}
+
+# Fingerprint of the ECOM tables; the cube is rebuilt when it changes.
+# The statistics collector's insert/update/delete counters catch UPDATEs that
+# leave row counts alone (a few seconds after commit, once the writer flushes
+# its statistics); the row counts catch TRUNCATE, which the counters miss.
+DATA_VERSION_TABLES = ('customers', 'orders', 'products', 'order_items', 'payments')
+DATA_VERSION_SQL = """
+SELECT relname, relid, n_tup_ins, n_tup_upd, n_tup_del,
+       CASE relname
+           WHEN 'customers' THEN (SELECT COUNT(*) FROM customers)
+           WHEN 'orders' THEN (SELECT COUNT(*) FROM orders)
+           WHEN 'products' THEN (SELECT COUNT(*) FROM products)
+           WHEN 'order_items' THEN (SELECT COUNT(*) FROM order_items)
+           WHEN 'payments' THEN (SELECT COUNT(*) FROM payments)
+       END AS row_count
+FROM pg_stat_user_tables
+WHERE relid IN ('customers'::regclass, 'orders'::regclass, 'products'::regclass,
+                'order_items'::regclass, 'payments'::regclass)
+ORDER BY relname
+"""
+
+# Orders deduplicated to one row per order_id (duplicates are exact copies)
+ORDERS_SQL = """
+SELECT o.order_id, o.customer_id, o.month, c.customer_state, o.order_status, o.records
+FROM (
+    SELECT order_id,
+           MIN(customer_id) AS customer_id,
+           MIN(order_status) AS order_status,
+           TO_CHAR(MIN(order_purchase_timestamp)::TIMESTAMP, 'YYYY-MM') AS month,
+           COUNT(*) AS records
+    FROM orders
+    GROUP BY order_id
+) o
+LEFT JOIN (
+    SELECT customer_id, MIN(customer_state) AS customer_state
+    FROM customers
+    GROUP BY customer_id
+) c ON o.customer_id = c.customer_id
+"""
+
+PAYMENTS_SQL = """
+SELECT order_id, SUM(payment_value), COUNT(payment_value)
+FROM payments
+GROUP BY order_id
+"""
+
+CUSTOMERS_SQL = """
+SELECT customer_state, COUNT(*), COUNT(customer_id)
+FROM customers
+GROUP BY customer_state
+"""
+
+PRODUCTS_SQL = 'SELECT product_id, "product category" FROM products'
+
+ORDER_ITEMS_SQL = "SELECT order_id, product_id FROM order_items"
+
+# The cube collapses orders to one row per order_id and counts customers and
+# products per cell, which is only exact when these come back zero. A NULL next to a value
+# counts as a second value, since SQL would group it separately.
+ASSUMPTION_CHECKS = {
+    'order_ids with more than one order_status': """
+        SELECT COUNT(*) FROM (
+            SELECT order_id FROM orders GROUP BY order_id
+            HAVING COUNT(DISTINCT order_status) + (COUNT(*) > COUNT(order_status))::int > 1
+        ) x
+    """,
+    'order_ids with more than one purchase timestamp': """
+        SELECT COUNT(*) FROM (
+            SELECT order_id FROM orders GROUP BY order_id
+            HAVING COUNT(DISTINCT order_purchase_timestamp)
+                   + (COUNT(*) > COUNT(order_purchase_timestamp))::int > 1
+        ) x
+    """,
+    'order_ids with more than one customer_id': """
+        SELECT COUNT(*) FROM (
+            SELECT order_id FROM orders GROUP BY order_id
+            HAVING COUNT(DISTINCT customer_id) + (COUNT(*) > COUNT(customer_id))::int > 1
+        ) x
+    """,
+    'customer_ids with more than one order': """
+        SELECT COUNT(*) FROM (
+            SELECT customer_id FROM orders WHERE customer_id IS NOT NULL GROUP BY customer_id
+            HAVING COUNT(DISTINCT order_id) + (COUNT(*) > COUNT(order_id))::int > 1
+        ) x
+    """,
+    'customer_ids with more than one customer_state': """
+        SELECT COUNT(*) FROM (
+            SELECT customer_id FROM customers WHERE customer_id IS NOT NULL GROUP BY customer_id
+            HAVING COUNT(DISTINCT customer_state) + (COUNT(*) > COUNT(customer_state))::int > 1
+        ) x
+    """,
+    'product_ids with more than one category': """
+        SELECT COUNT(*) FROM (
+            SELECT product_id FROM products WHERE product_id IS NOT NULL GROUP BY product_id
+            HAVING COUNT(DISTINCT "product category")
+                   + (COUNT(*) > COUNT("product category"))::int > 1
+        ) x
+    """,
+}
+
+
+class CubeAssumptionError(ValueError):
+    """The tables break an assumption the cube relies on; use SQL instead"""
+
+
+class Dimension:
+    """Dictionary-encoded dimension: sorted labels, with None (NULL) last"""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = np.array(list(labels), dtype=object)
+        self._known = [label for label in labels if label is not None]
+        self._index = {label: code for code, label in enumerate(self._known)}
+        self._null_code = len(self._known) if len(self._known) < len(labels) else None
+
+    @classmethod
+    def from_values(cls, name, *value_lists):
+        """Build the label dictionary from every value the facts contain"""
+        values = pd.Series(np.concatenate([np.asarray(v, dtype=object) for v in value_lists]),
+                           dtype=object)
+        labels = sorted(values.dropna().unique())
+        if values.isna().any():
+            labels.append(None)
+        return cls(name, labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def encode(self, values):
+        """Codes for an array of labels"""
+        codes = pd.Categorical(pd.Series(values, dtype=object),
+                               categories=self._known).codes.astype(np.int64)
+        if self._null_code is not None:
+            codes[codes < 0] = self._null_code
+        return codes
+
+    def codes_for(self, labels):
+        """Codes for the labels a filter asks for; unknown labels match nothing"""
+        codes = []
+        for label in labels:
+            if label is None:
+                if self._null_code is not None:
+                    codes.append(self._null_code)
+            elif label in self._index:
+                codes.append(self._index[label])
+        return np.array(codes, dtype=np.int64)
+
+    def nbytes(self):
+        return sum(len(str(label)) for label in self.labels) + self.labels.nbytes
+
+
+class Measure:
+    """Additive measure over some dimensions, stored dense or as sparse coordinates.
+
+    Dense measures keep a boolean ``occupied`` array marking the cells that
+    have facts, so a group summing to zero is still a group, like in SQL.
+    """
+
+    def __init__(self, name, dims, shape, dense=None, occupied=None, coords=None, values=None):
+        self.name = name
+        self.dims = tuple(dims)
+        self.shape = tuple(shape)
+        self.dense = dense
+        self.occupied = occupied
+        self.coords = coords
+        self.values = values
+
+    @classmethod
+    def from_facts(cls, name, dims, shape, codes, weights, dtype):
+        """Sum ``weights`` into the cells addressed by ``codes`` (one array per dim)"""
+        weights = np.asarray(weights, dtype=np.float64)
+        if not dims:
+            return cls(name, dims, shape, dense=np.array(weights.sum(), dtype=dtype),
+                       occupied=np.array(len(weights) > 0))
+
+        flat = np.ravel_multi_index(codes, shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+        sums = _cast(np.bincount(inverse, weights=weights, minlength=len(cells)), dtype)
+
+        if len(cells) / np.prod(shape) < SPARSE_DENSITY:
+            coord_dtype = np.min_scalar_type(max(shape) - 1)
+            coords = np.stack(np.unravel_index(cells, shape), axis=1).astype(coord_dtype)
+            return cls(name, dims, shape, coords=coords, values=sums)
+
+        dense = np.zeros(int(np.prod(shape)), dtype=dtype)
+        dense[cells] = sums
+        occupied = np.zeros(int(np.prod(shape)), dtype=bool)
+        occupied[cells] = True
+        return cls(name, dims, shape, dense=dense.reshape(shape), occupied=occupied.reshape(shape))
+
+    @property
+    def storage(self):
+        return 'dense' if self.dense is not None else 'sparse'
+
+    def nbytes(self):
+        if self.dense is not None:
+            return self.dense.nbytes + self.occupied.nbytes
+        return self.coords.nbytes + self.values.nbytes
+
+    def cells(self):
+        return int(np.count_nonzero(self.occupied)) if self.dense is not None else len(self.values)
+
+
+class EcomCube:
+    """Dimensions and measures for one version of the ECOM data"""
+
+    def __init__(self, dims, measures, version, built_at):
+        self.dims = dims
+        self.measures = measures
+        self.version = version
+        self.built_at = built_at
+
+    def aggregate(self, measure, by=(), where=None):
+        """Sum ``measure`` grouped by the ``by`` dimensions.
+
+        ``where`` maps dimension names to the labels to keep. Returns a scalar
+        when ``by`` is empty, otherwise a DataFrame with one column per ``by``
+        dimension plus the measure, holding only non-empty groups.
+        """
+        m = self.measures[measure]
+        where = where or {}
+        for dim in list(by) + list(where):
+            if dim not in m.dims:
+                raise ValueError(f"Measure '{measure}' has no '{dim}' dimension")
+        keep = [m.dims.index(dim) for dim in by]
+
+        if m.dense is not None:
+            cube, occupied = m.dense, m.occupied
+            # Filtered axes are re-indexed by np.take; remember the codes they kept
+            taken = {}
+            for axis, dim in enumerate(m.dims):
+                if dim in where:
+                    taken[axis] = self.dims[dim].codes_for(where[dim])
+                    cube = np.take(cube, taken[axis], axis=axis)
+                    occupied = np.take(occupied, taken[axis], axis=axis)
+            dropped = tuple(i for i in range(len(m.dims)) if i not in keep)
+            cube = cube.sum(axis=dropped)
+            if not by:
+                return cube.item()
+            order = [sorted(keep).index(i) for i in keep]
+            cube = np.transpose(cube, order)
+            occupied = np.transpose(occupied.any(axis=dropped), order)
+            positions = np.nonzero(occupied)
+            values = cube[positions]
+            codes = [taken[axis][p] if axis in taken else p for axis, p in zip(keep, positions)]
+        else:
+            mask = np.ones(len(m.values), dtype=bool)
+            for axis, dim in enumerate(m.dims):
+                if dim in where:
+                    mask &= np.isin(m.coords[:, axis], self.dims[dim].codes_for(where[dim]))
+            coords, values = m.coords[mask], m.values[mask]
+            if not by:
+                return values.sum().item()
+            shape = [m.shape[i] for i in keep]
+            flat = np.ravel_multi_index(coords[:, keep].T.astype(np.int64), shape)
+            cells, inverse = np.unique(flat, return_inverse=True)
+            values = _cast(np.bincount(inverse, weights=values, minlength=len(cells)), m.values.dtype)
+            codes = np.unravel_index(cells, shape)
+
+        # Series keep None labels as None rather than NaN
+        frame = pd.DataFrame({dim: pd.Series(self.dims[dim].labels[c], dtype=object)
+                              for dim, c in zip(by, codes)})
+        frame[measure] = values
+        return frame
+
+    def answer(self, view, where=None):
+        """Rows for a dashboard view, shaped like cursor.fetchall() on VIEW_QUERIES[view].
+
+        Filters on dimensions a view's measures don't have are ignored.
+        """
+        return VIEW_ANSWERS[view](self, where or {})
+
+    def footprint(self):
+        """Bytes used by every dimension and measure"""
+        report = [{'name': dim.name, 'kind': 'dimension', 'storage': f'{len(dim)} labels',
+                   'shape': (len(dim),), 'cells': len(dim), 'bytes': dim.nbytes()}
+                  for dim in self.dims.values()]
+        report += [{'name': m.name, 'kind': 'measure', 'storage': m.storage,
+                    'shape': m.shape, 'cells': m.cells(), 'bytes': m.nbytes()}
+                   for m in self.measures.values()]
+        return report
+
+    def nbytes(self):
+        return sum(entry['bytes'] for entry in self.footprint())
+
+    def save(self, path):
+        """Write the cube to an .npz file"""
+        meta = {
+            'version': self.version,
+            'built_at': self.built_at,
+            'dims': {name: list(dim.labels) for name, dim in self.dims.items()},
+            'measures': {name: {'dims': m.dims, 'shape': m.shape, 'storage': m.storage}
+                         for name, m in self.measures.items()},
+        }
+        arrays = {}
+        for name, m in self.measures.items():
+            if m.dense is not None:
+                arrays[f'{name}.dense'] = m.dense
+                arrays[f'{name}.occupied'] = m.occupied
+            else:
+                arrays[f'{name}.coords'] = m.coords
+                arrays[f'{name}.values'] = m.values
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a cube written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].item())
+            dims = {name: Dimension(name, labels) for name, labels in meta['dims'].items()}
+            measures = {}
+            for name, info in meta['measures'].items():
+                if info['storage'] == 'dense':
+                    measures[name] = Measure(name, info['dims'], info['shape'],
+                                             dense=data[f'{name}.dense'],
+                                             occupied=data[f'{name}.occupied'])
+                else:
+                    measures[name] = Measure(name, info['dims'], info['shape'],
+                                             coords=data[f'{name}.coords'],
+                                             values=data[f'{name}.values'])
+        return cls(dims, measures, meta['version'], meta['built_at'])
+
+
+def _cast(sums, dtype):
+    """bincount always sums in float64; round back for integer measures"""
+    if np.issubdtype(dtype, np.integer):
+        return np.rint(sums).astype(dtype)
+    return sums.astype(dtype)
+
+
+def _fetch(conn, query, columns):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        cursor.close()
+
+
+def data_version(conn):
+    """Short hash identifying the current contents of the ECOM tables"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(DATA_VERSION_SQL)
+        fingerprint = cursor.fetchall()
+    finally:
+        cursor.close()
+    if len(fingerprint) != len(DATA_VERSION_TABLES):
+        # Never hand out a version we can't vouch for: callers would reuse a stale cube
+        raise ValueError(f"No table statistics for all of {', '.join(DATA_VERSION_TABLES)}")
+    return hashlib.md5(repr(fingerprint).encode()).hexdigest()[:12]
+
+
+def check_assumptions(conn):
+    """Raise CubeAssumptionError if the cube could not answer like SQL"""
+    cursor = conn.cursor()
+    try:
+        broken = []
+        for check, query in ASSUMPTION_CHECKS.items():
+            cursor.execute(query)
+            count = cursor.fetchone()[0]
+            if count:
+                broken.append(f"{count} {check}")
+    finally:
+        cursor.close()
+    if broken:
+        raise CubeAssumptionError("Refusing to build the cube: " + "; ".join(broken))
+
+
+def build_cube(conn, version=None):
+    """Read the ECOM tables once and build the cube"""
+    version = version or data_version(conn)
+    check_assumptions(conn)
+
+    orders = _fetch(conn, ORDERS_SQL,
+                    ['order_id', 'customer_id', 'month', 'state', 'status', 'records'])
+    payments = _fetch(conn, PAYMENTS_SQL, ['order_id', 'payment_sum', 'payment_rows'])
+    customers = _fetch(conn, CUSTOMERS_SQL, ['state', 'customer_rows', 'customer_ids'])
+    products = _fetch(conn, PRODUCTS_SQL, ['product_id', 'category'])
+    items = _fetch(conn, ORDER_ITEMS_SQL, ['order_id', 'product_id'])
+
+    payments['payment_sum'] = payments['payment_sum'].astype(float).fillna(0)
+    known_orders = orders.dropna(subset=['order_id'])
+
+    # Payments of orders that exist, for the time series view (inner join)
+    paid = known_orders.merge(payments.dropna(subset=['order_id']), on='order_id')
+
+    # Category revenue: every payment of an order counts once per matching
+    # item/product pair, exactly like the dashboard's three-way join
+    item_revenue = (items.dropna()
+                    .merge(products.dropna(subset=['product_id']), on='product_id')
+                    .merge(payments.dropna(subset=['order_id'])[['order_id', 'payment_sum']],
+                           on='order_id')
+                    .merge(known_orders[['order_id', *ORDER_DIMS]], on='order_id', how='left'))
+
+    # Customers are counted per cell; one customer_id per order keeps this additive
+    active = known_orders.dropna(subset=['customer_id']).drop_duplicates(
+        subset=['customer_id', *ORDER_DIMS])
+
+    product_counts = (products.dropna(subset=['product_id'])
+                      .groupby('category', dropna=False)['product_id'].nunique()
+                      .reset_index())
+
+    dims = {
+        'month': Dimension.from_values('month', orders['month'], item_revenue['month']),
+        'state': Dimension.from_values('state', orders['state'], item_revenue['state'],
+                                       customers['state']),
+        'status': Dimension.from_values('status', orders['status'], item_revenue['status']),
+        'category': Dimension.from_values('category', products['category']),
+    }
+
+    def measure(name, frame, dim_names, weights, dtype):
+        shape = tuple(len(dims[d]) for d in dim_names)
+        codes = tuple(dims[d].encode(frame[d]) for d in dim_names)
+        return Measure.from_facts(name, dim_names, shape, codes, weights, dtype)
+
+    measures = [
+        measure('orders', known_orders, ORDER_DIMS, np.ones(len(known_orders)), np.int32),
+        measure('order_records', orders, ORDER_DIMS, orders['records'], np.int32),
+        measure('active_customers', active, ORDER_DIMS, np.ones(len(active)), np.int32),
+        measure('paid_orders', paid, ORDER_DIMS, np.ones(len(paid)), np.int32),
+        measure('revenue', paid, ORDER_DIMS, paid['payment_sum'], np.float64),
+        measure('category_revenue', item_revenue, ORDER_DIMS + ('category',),
+                item_revenue['payment_sum'], np.float64),
+        measure('customers', customers, ('state',), customers['customer_rows'], np.int32),
+        measure('customer_ids', customers, ('state',), customers['customer_ids'], np.int32),
+        measure('products', product_counts, ('category',), product_counts['product_id'], np.int32),
+        measure('payment_value', payments, (), payments['payment_sum'], np.float64),
+        measure('payment_rows', payments, (), payments['payment_rows'], np.int64),
+    ]
+
+    built_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    return EcomCube(dims, {m.name: m for m in measures}, version, built_at)
+
+
+def load_saved(path, version):
+    """The cube saved at ``path`` if it was built for ``version``, else None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        cube = EcomCube.load(path)
+    except (OSError, ValueError, KeyError):
+        # Unreadable or from an older layout
+        return None
+    return cube if cube.version == version else None
+
+
+def load_or_build(conn, path=CUBE_FILE, version=None, rebuild=False):
+    """Load the saved cube if it matches the data version, otherwise build and save it"""
+    version = version or data_version(conn)
+    cube = None if rebuild else load_saved(path, version)
+    if cube is None:
+        cube = build_cube(conn, version)
+        cube.save(path)
+    return cube
+
+
+# View answers: each mirrors the SQL of the same name in VIEW_QUERIES
+
+def _total(cube, measure, where):
+    dims = cube.measures[measure].dims
+    return cube.aggregate(measure, where={d: v for d, v in where.items() if d in dims})
+
+
+def _grouped(cube, measure, by, where):
+    dims = cube.measures[measure].dims
+    return cube.aggregate(measure, by=by, where={d: v for d, v in where.items() if d in dims})
+
+
+def _round(value, digits):
+    """Round half away from zero, like PostgreSQL's ROUND on NUMERIC"""
+    quantum = Decimal(1).scaleb(-digits)
+    return float(Decimal(repr(float(value))).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+def _ratio(numerator, denominator, digits):
+    return _round(numerator / denominator, digits) if denominator else None
+
+
+def _top(frame, column, label, limit=None):
+    frame = frame.sort_values([column, label], ascending=[False, True], na_position='last')
+    return frame if limit is None else frame.head(limit)
+
+
+def _by_month(frame):
+    return frame.sort_values('month', na_position='last')
+
+
+def _monthly_revenue(cube, where):
+    frame = _grouped(cube, 'paid_orders', ('month',), where).merge(
+        _grouped(cube, 'revenue', ('month',), where), on='month', how='left').fillna({'revenue': 0})
+    return [(month, _round(revenue, 2), int(count))
+            for month, count, revenue in _by_month(frame).itertuples(index=False)]
+
+
+VIEW_ANSWERS = {
+    'total_customers': lambda cube, where: [(int(_total(cube, 'customer_ids', where)),)],
+    'unique_orders': lambda cube, where: [(int(_total(cube, 'orders', where)),)],
+    'order_records': lambda cube, where: [(int(_total(cube, 'order_records', where)),)],
+    'total_revenue': lambda cube, where: [(_round(_total(cube, 'payment_value', where), 2),)],
+    'active_customers': lambda cube, where: [(int(_total(cube, 'active_customers', where)),)],
+    'avg_order_value': lambda cube, where: [(_ratio(_total(cube, 'payment_value', where),
+                                                    _total(cube, 'payment_rows', where), 2),)],
+    'orders_per_customer': lambda cube, where: [(_ratio(_total(cube, 'orders', where),
+                                                        _total(cube, 'active_customers', where), 2),)],
+    'total_products': lambda cube, where: [(int(_total(cube, 'products', where)),)],
+    'duplicate_factor': lambda cube, where: [(_ratio(_total(cube, 'order_records', where),
+                                                     _total(cube, 'orders', where), 1),)],
+    'customers_by_state': lambda cube, where: [
+        (state, int(count)) for state, count in
+        _top(_grouped(cube, 'customers', ('state',), where), 'customers', 'state', 10)
+        .itertuples(index=False)],
+    'orders_by_status': lambda cube, where: [
+        (status, int(count)) for status, count in
+        _top(_grouped(cube, 'orders', ('status',), where), 'orders', 'status')
+        .itertuples(index=False)],
+    'orders_by_month': lambda cube, where: [
+        (month, int(count)) for month, count in
+        _by_month(_grouped(cube, 'orders', ('month',), where)).itertuples(index=False)],
+    'category_revenue': lambda cube, where: [
+        (category, revenue) for category, revenue in
+        _top(_grouped(cube, 'category_revenue', ('category',), where)
+             .assign(category_revenue=lambda f: f['category_revenue'].map(lambda v: _round(v, 2))),
+             'category_revenue', 'category', 10)
+        .itertuples(index=False)],
+    'monthly_revenue': _monthly_revenue,
+}
+
+
+# Equivalence checks against SQL
+
+# Filtered slices checked on top of the unfiltered views: (description,
+# view, cube filter, SQL returning the same rows)
+FILTER_CHECKS = [
+    ("delivered orders by month", 'orders_by_month', {'status': ['delivered']}, """
+        SELECT TO_CHAR(order_purchase_timestamp::TIMESTAMP, 'YYYY-MM') as month,
+               COUNT(DISTINCT order_id)
+        FROM orders
+        WHERE order_status = 'delivered'
+        GROUP BY 1
+        ORDER BY month
+    """),
+    ("delivered and shipped orders by status", 'orders_by_status',
+     {'status': ['delivered', 'shipped']}, """
+        SELECT order_status, COUNT(DISTINCT order_id) as count
+        FROM orders
+        WHERE order_status IN ('delivered', 'shipped')
+        GROUP BY order_status
+        ORDER BY count DESC
+    """),
+    ("orders by status in SP", 'orders_by_status', {'state': ['SP']}, """
+        SELECT o.order_status, COUNT(DISTINCT o.order_id) as count
+        FROM orders o
+        JOIN (SELECT DISTINCT customer_id, customer_state FROM customers) c
+          ON o.customer_id = c.customer_id
+        WHERE c.customer_state = 'SP'
+        GROUP BY o.order_status
+        ORDER BY count DESC
+    """),
+    ("delivered category revenue in SP and RJ", 'category_revenue',
+     {'status': ['delivered'], 'state': ['SP', 'RJ']}, """
+        SELECT p."product category" as category,
+               ROUND(SUM(pay.payment_value)::NUMERIC, 2) as total_revenue
+        FROM products p
+        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN payments pay ON oi.order_id = pay.order_id
+        JOIN (SELECT DISTINCT order_id, customer_id, order_status FROM orders) o
+          ON oi.order_id = o.order_id
+        JOIN (SELECT DISTINCT customer_id, customer_state FROM customers) c
+          ON o.customer_id = c.customer_id
+        WHERE o.order_status = 'delivered' AND c.customer_state IN ('SP', 'RJ')
+        GROUP BY p."product category"
+        ORDER BY total_revenue DESC
+        LIMIT 10
+    """),
+]
+
+
+def _normalize(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _same_value(a, b, tolerance=0.011):
+    a, b = _normalize(a), _normalize(b)
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= tolerance
+    return a == b
+
+
+def rows_match(sql_rows, cube_rows):
+    """Compare result rows; the label column may differ only among ties at a LIMIT"""
+    if len(sql_rows) != len(cube_rows):
+        return False
+    if not sql_rows:
+        return True
+    if len(sql_rows[0]) == 1:
+        return _same_value(sql_rows[0][0], cube_rows[0][0])
+
+    # Values must match row for row, in order
+    for sql_row, cube_row in zip(sql_rows, cube_rows):
+        if not all(_same_value(a, b) for a, b in zip(sql_row[1:], cube_row[1:])):
+            return False
+
+    # Labels must match, except where rows tie on value
+    sql_labels = {row[0]: _normalize(row[1]) for row in sql_rows}
+    cube_labels = {row[0]: _normalize(row[1]) for row in cube_rows}
+    values = list(sql_labels.values())
+    tied = {value for value in values if values.count(value) > 1}
+    tied.add(values[-1])  # may tie with rows cut off by the LIMIT
+    for label in set(sql_labels) ^ set(cube_labels):
+        if sql_labels.get(label, cube_labels.get(label)) not in tied:
+            return False
+    return True
+
+
+def verify(cube, conn):
+    """Run every view through SQL and the cube and report whether they agree"""
+    checks = [(view, view, {}, query) for view, query in VIEW_QUERIES.items()]
+    checks += FILTER_CHECKS
+    failures = 0
+    cursor = conn.cursor()
+    try:
+        for description, view, where, query in checks:
+            try:
+                cursor.execute(query)
+            except psycopg2.Error as err:
+                failures += 1
+                print(f"❌ {description}: SQL failed: {err}")
+                continue
+            sql_rows = cursor.fetchall()
+            cube_rows = cube.answer(view, where)
+            if rows_match(sql_rows, cube_rows):
+                print(f"✅ {description}: {len(sql_rows)} rows match")
+            else:
+                failures += 1
+                print(f"❌ {description}: cube does not match SQL")
+                print(f"   SQL:  {sql_rows[:5]}")
+                print(f"   cube: {cube_rows[:5]}")
+    finally:
+        cursor.close()
+    return failures == 0
+
+
+def print_footprint(cube):
+    print(f"🧊 Cube version {cube.version}, built {cube.built_at}")
+    print("=" * 78)
+    print(f"{'Name':<20}{'Kind':<11}{'Storage':<13}{'Shape':<18}{'Cells':>8}{'Bytes':>8}")
+    for entry in cube.footprint():
+        shape = ' x '.join(str(n) for n in entry['shape']) or 'scalar'
+        print(f"{entry['name']:<20}{entry['kind']:<11}{entry['storage']:<13}"
+              f"{shape:<18}{entry['cells']:>8,}{entry['bytes']:>8,}")
+    print("=" * 78)
+    print(f"📦 Total: {cube.nbytes() / 1024:,.1f} KiB")
+
+
+def connect(dsn=None):
+    """Connect like the dashboard's local fallback unless a DSN is given"""
+    dsn = dsn or os.environ.get('DATABASE_URL')
+    if dsn:
+        conn = psycopg2.connect(dsn)
+    else:
+        conn = psycopg2.connect(host='localhost', user='postgres', password='Punarbasu_03',
+                                database='ECOM', port='5432')
+    conn.autocommit = True
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['rebuild', 'footprint', 'verify'])
+    parser.add_argument('--dsn', help="PostgreSQL DSN (default: $DATABASE_URL or local ECOM)")
+    parser.add_argument('--file', default=CUBE_FILE, help="cube file to read or write")
+    args = parser.parse_args()
+
+    conn = connect(args.dsn)
+    try:
+        if args.command == 'rebuild':
+            print("🏗️ Building cube from the ECOM tables...")
+            cube = load_or_build(conn, args.file, rebuild=True)
+            print(f"✅ Saved cube version {cube.version} to {args.file}")
+            print_footprint(cube)
+            return 0
+
+        cube = load_or_build(conn, args.file)
+        if args.command == 'footprint':
+            print_footprint(cube)
+            return 0
+
+        print(f"🧪 Checking cube version {cube.version} against SQL...")
+        ok = verify(cube, conn)
+        print("🎉 Cube matches SQL!" if ok else "❌ Cube and SQL disagree")
+        return 0 if ok else 1
+    except CubeAssumptionError as err:
+        print(f"❌ {err}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,12 +2,19 @@ import streamlit as st
 import pandas as pd
 import seaborn as sns
 import psycopg2
+import psycopg2.extensions
 import numpy as np
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+import logging
+import select
+import threading
+import time
 from urllib.parse import urlparse
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import ecom_cube
 
 # Set page config - PostgreSQL compatible version
 st.set_page_config(
@@ -32,69 +39,316 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database connection function
+# Query guard settings: timeouts are in milliseconds, cost in planner units
+DEFAULT_STATEMENT_TIMEOUT_MS = int(os.environ.get('STATEMENT_TIMEOUT_MS', '15000'))
+QUERY_COST_BUDGET = float(os.environ.get('QUERY_COST_BUDGET', '5000000'))
+CANCEL_POLL_INTERVAL = 0.1
+
+# Total time every query on a page may take together
+PAGE_TIME_BUDGETS_MS = {
+    " Overview": 20000,
+    " Customer Analysis": 10000,
+    " Order Analysis": 30000,
+    " Sales & Revenue": 45000,
+    " Time Series Analysis": 30000,
+}
+
+logger = logging.getLogger(__name__)
+
 @st.cache_resource
+def warn_cancellation_unsupported():
+    """Log once per process that superseded queries can't be cancelled"""
+    logger.warning(
+        "Streamlit %s has no ScriptRequests._state; queries of superseded reruns "
+        "will not be cancelled. Check the streamlit pin in requirements.txt.",
+        st.__version__,
+    )
+
+def rerun_requested():
+    """Check whether Streamlit has asked the current script run to stop or rerun
+
+    Relies on Streamlit's private ScriptRequests._state (see the version pin in
+    requirements.txt).
+    """
+    # Threads without a script context (keep-warm, cube builds) never rerun
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return False
+    state = getattr(getattr(ctx, 'script_requests', None), '_state', None)
+    if state is None:
+        warn_cancellation_unsupported()
+        return False
+    return state.name != 'CONTINUE'
+
+def cancellable_wait(conn):
+    """psycopg2 wait callback that cancels queries belonging to a superseded rerun
+
+    Works like psycopg2.extras.wait_select, but wakes up regularly so that a
+    page switch (which makes Streamlit request a rerun) sends a cancel request
+    to the server instead of leaving the old query running.
+
+    libpq ignores ``connect_timeout`` on the asynchronous connect a wait
+    callback uses, so the timeout is enforced here while connecting.
+    """
+    cancelled = False
+    deadline = None
+    if conn.status == psycopg2.extensions.STATUS_SETUP:
+        connect_timeout = int(psycopg2.extensions.parse_dsn(conn.dsn).get('connect_timeout', 0))
+        if connect_timeout > 0:
+            deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            state = conn.poll()
+            if state == psycopg2.extensions.POLL_OK:
+                break
+            elif state == psycopg2.extensions.POLL_READ:
+                select.select([conn.fileno()], [], [], CANCEL_POLL_INTERVAL)
+            elif state == psycopg2.extensions.POLL_WRITE:
+                select.select([], [conn.fileno()], [], CANCEL_POLL_INTERVAL)
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+        except KeyboardInterrupt:
+            conn.cancel()
+            cancelled = True
+            continue
+        if deadline is not None and time.monotonic() > deadline:
+            raise psycopg2.OperationalError(f"timeout expired: no connection after {connect_timeout}s")
+        if not cancelled and rerun_requested():
+            try:
+                conn.cancel()
+            except psycopg2.Error:
+                pass
+            cancelled = True
+
+psycopg2.extensions.set_wait_callback(cancellable_wait)
+
+def start_page_budget(page):
+    """Start the time budget for all queries rendered on this page"""
+    budget_ms = PAGE_TIME_BUDGETS_MS.get(page, DEFAULT_STATEMENT_TIMEOUT_MS)
+    st.session_state['page_deadline'] = time.monotonic() + budget_ms / 1000
+
+def effective_timeout_ms(timeout_ms=None):
+    """Per-query timeout, capped by what is left of the page budget"""
+    timeout_ms = timeout_ms or DEFAULT_STATEMENT_TIMEOUT_MS
+    deadline = st.session_state.get('page_deadline')
+    if deadline is not None:
+        timeout_ms = min(timeout_ms, int((deadline - time.monotonic()) * 1000))
+    return timeout_ms
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def estimate_query_cost(query, _connection):
+    """Planner's total cost estimate for a query, from EXPLAIN"""
+    cursor = _connection.cursor()
+    try:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + query)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    return plan[0]['Plan']['Total Cost']
+
+# Connection lifecycle settings (serverless Postgres may drop idle sockets)
+KEEPALIVE_OPTIONS = {
+    'keepalives': 1,
+    'keepalives_idle': 30,
+    'keepalives_interval': 10,
+    'keepalives_count': 5,
+    'connect_timeout': 15,
+}
+VALIDATE_AFTER_IDLE_S = 30
+MAX_READ_RETRIES = 3
+RETRY_BACKOFF_S = 0.5
+KEEP_WARM = os.environ.get('KEEP_WARM', '0') == '1'
+KEEP_WARM_INTERVAL_S = int(os.environ.get('KEEP_WARM_INTERVAL_S', '240'))
+KEEP_WARM_HOURS = tuple(int(h) for h in os.environ.get('KEEP_WARM_HOURS', '8-18').split('-'))
+
+def resolve_connection_params():
+    """Work out where to connect: returns (connect args, connect kwargs, source label)"""
+    # Check for NeonDB/PostgreSQL DATABASE_URL (priority for cloud deployment)
+    if "DATABASE_URL" in st.secrets:
+        return (st.secrets["DATABASE_URL"],), {'sslmode': 'require'}, "NeonDB PostgreSQL"
+
+    # Check for individual PostgreSQL environment variables
+    elif all(key in os.environ for key in ['PGHOST', 'PGUSER', 'PGPASSWORD', 'PGDATABASE']):
+        return (), {
+            'host': os.environ['PGHOST'],
+            'user': os.environ['PGUSER'],
+            'password': os.environ['PGPASSWORD'],
+            'database': os.environ['PGDATABASE'],
+            'port': os.environ.get('PGPORT', '5432'),
+            'sslmode': 'require'
+        }, "PostgreSQL (environment)"
+
+    # Try to use Streamlit secrets (for Streamlit Cloud)
+    elif hasattr(st, 'secrets') and 'connections' in st.secrets and 'neon' in st.secrets.connections:
+        # Use NeonDB connection URL from secrets
+        return (st.secrets.connections.neon.url,), {}, "NeonDB via connection URL"
+
+    # Try individual PostgreSQL secrets
+    elif hasattr(st, 'secrets') and 'postgresql' in st.secrets:
+        return (), {
+            'host': st.secrets.postgresql.host,
+            'user': st.secrets.postgresql.user,
+            'password': st.secrets.postgresql.password,
+            'database': st.secrets.postgresql.database,
+            'port': st.secrets.postgresql.get('port', '5432'),
+            'sslmode': 'require'
+        }, "Streamlit Cloud PostgreSQL"
+    else:
+        # Use local PostgreSQL (for local development)
+        return (), {
+            'host': 'localhost',
+            'user': 'postgres',
+            'password': 'Punarbasu_03',
+            'database': 'ECOM',
+            'port': '5432'
+        }, "local PostgreSQL"
+
+class ConnectionManager:
+    """Owns the shared connection: validates it before use, reconnects when it
+    has been dropped, retries idempotent reads and can keep the compute warm.
+
+    All use of the connection goes through ``lock`` so per-query settings such
+    as statement_timeout never leak between sessions.
+    """
+
+    def __init__(self, connect_args, connect_kwargs, source):
+        self.connect_args = connect_args
+        self.connect_kwargs = {**KEEPALIVE_OPTIONS, **connect_kwargs}
+        self.source = source
+        self.lock = threading.Lock()
+        self.metrics = {
+            'connects': 0,
+            'reconnects': 0,
+            'read_retries': 0,
+            'failed_validations': 0,
+            'keep_warm_pings': 0,
+            'last_cold_start_ms': None,
+            'max_cold_start_ms': None,
+        }
+        self._conn = None
+        self._last_used = 0.0
+        self._keep_warm_thread = None
+
+    def _connect(self):
+        started = time.perf_counter()
+        conn = psycopg2.connect(*self.connect_args, **self.connect_kwargs)
+        conn.autocommit = True
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        if self.metrics['connects'] > 0:
+            self.metrics['reconnects'] += 1
+        self.metrics['connects'] += 1
+        self.metrics['last_cold_start_ms'] = elapsed_ms
+        self.metrics['max_cold_start_ms'] = max(self.metrics['max_cold_start_ms'] or 0, elapsed_ms)
+        self._conn = conn
+
+    def _discard(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+        self._conn = None
+
+    def _ping(self):
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def connection(self, validate=False):
+        """Return a live connection, reconnecting if needed. Call with ``lock`` held."""
+        if self._conn is None or self._conn.closed:
+            self._discard()
+            self._connect()
+        elif validate or time.monotonic() - self._last_used > VALIDATE_AFTER_IDLE_S:
+            try:
+                self._ping()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as err:
+                if not self.connection_lost(err):
+                    raise
+                self.metrics['failed_validations'] += 1
+                self._discard()
+                self._connect()
+        self._last_used = time.monotonic()
+        return self._conn
+
+    def connection_lost(self, err):
+        """Whether ``err`` means the connection is gone, rather than that a statement failed
+
+        Errors the server reports with a SQLSTATE (lock timeouts, out of memory,
+        serialization failures, cancelled queries) leave a healthy connection,
+        except connection exceptions (class 08) and shutdowns (class 57P).
+        """
+        if self._conn is None or self._conn.closed or isinstance(err, psycopg2.InterfaceError):
+            return True
+        if not isinstance(err, psycopg2.OperationalError):
+            return False
+        return err.pgcode is None or err.pgcode.startswith(('08', '57P'))
+
+    def run_read(self, read):
+        """Run ``read(connection)``, retrying with backoff if the connection drops.
+
+        Only for idempotent reads: a retried call may repeat work the server
+        already did.
+        """
+        for attempt in range(MAX_READ_RETRIES + 1):
+            with self.lock:
+                try:
+                    return read(self.connection())
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as err:
+                    if not self.connection_lost(err):
+                        raise
+                    self._discard()
+                    if attempt == MAX_READ_RETRIES:
+                        raise
+                    self.metrics['read_retries'] += 1
+            time.sleep(RETRY_BACKOFF_S * 2 ** attempt)
+
+    def reset(self):
+        """Drop the current connection; the next use reconnects"""
+        with self.lock:
+            self._discard()
+
+    def start_keep_warm(self):
+        """Ping the database during business hours so the compute isn't suspended"""
+        if self._keep_warm_thread is None:
+            self._keep_warm_thread = threading.Thread(target=self._keep_warm, daemon=True)
+            self._keep_warm_thread.start()
+
+    def _keep_warm(self):
+        start_hour, end_hour = KEEP_WARM_HOURS
+        while True:
+            time.sleep(KEEP_WARM_INTERVAL_S)
+            now = time.localtime()
+            if now.tm_wday >= 5 or not start_hour <= now.tm_hour < end_hour:
+                continue
+            try:
+                with self.lock:
+                    self.connection(validate=True)
+                    self.metrics['keep_warm_pings'] += 1
+            except psycopg2.Error:
+                # Try again on the next tick
+                pass
+
+@st.cache_resource
+def get_connection_manager():
+    """Shared connection manager for every session"""
+    manager = ConnectionManager(*resolve_connection_params())
+    if KEEP_WARM:
+        manager.start_keep_warm()
+    return manager
+
+# Database connection function
 def get_database_connection():
-    """Establish database connection with caching"""
+    """Return the connection manager once it holds a working connection"""
     try:
-        # Check for NeonDB/PostgreSQL DATABASE_URL (priority for cloud deployment)
-        if "DATABASE_URL" in st.secrets:
-            DATABASE_URL=st.secrets["DATABASE_URL"]
-        # else 'DATABASE_URL' in os.environ:
-        #     database_url = os.environ['DATABASE_URL']
-            conn = psycopg2.connect(DATABASE_URL, sslmode='require')
-            conn.autocommit = True
-            # st.success("🌐 Connected to NeonDB PostgreSQL database")
-            return conn
-        
-        # Check for individual PostgreSQL environment variables
-        elif all(key in os.environ for key in ['PGHOST', 'PGUSER', 'PGPASSWORD', 'PGDATABASE']):
-            conn = psycopg2.connect(
-                host=os.environ['PGHOST'],
-                user=os.environ['PGUSER'],
-                password=os.environ['PGPASSWORD'],
-                database=os.environ['PGDATABASE'],
-                port=os.environ.get('PGPORT', '5432'),
-                sslmode='require'
-            )
-            conn.autocommit = True
-            st.success("🌐 Connected to PostgreSQL database")
-            return conn
-        
-        # Try to use Streamlit secrets (for Streamlit Cloud)
-        elif hasattr(st, 'secrets') and 'connections' in st.secrets and 'neon' in st.secrets.connections:
-            # Use NeonDB connection URL from secrets
-            neon_url = st.secrets.connections.neon.url
-            conn = psycopg2.connect(neon_url)
-            conn.autocommit = True
-            # st.success("🌐 Connected to NeonDB via connection URL")
-            return conn
-        
-        # Try individual PostgreSQL secrets
-        elif hasattr(st, 'secrets') and 'postgresql' in st.secrets:
-            conn = psycopg2.connect(
-                host=st.secrets.postgresql.host,
-                user=st.secrets.postgresql.user,
-                password=st.secrets.postgresql.password,
-                database=st.secrets.postgresql.database,
-                port=st.secrets.postgresql.get('port', '5432'),
-                sslmode='require'
-            )
-            conn.autocommit = True
-            st.success("☁️ Connected to Streamlit Cloud PostgreSQL database")
-            return conn
-        else:
-            # Use local PostgreSQL (for local development)
-            conn = psycopg2.connect(
-                host='localhost',
-                user='postgres',
-                password='Punarbasu_03',
-                database='ECOM',
-                port='5432'
-            )
-            conn.autocommit = True
-            st.success("💻 Connected to local PostgreSQL database")
-            return conn
+        manager = get_connection_manager()
+        with manager.lock:
+            manager.connection()
+        return manager
     except psycopg2.Error as err:
         st.error(f"Database connection failed: {err}")
         st.info("**Tip**: Make sure your PostgreSQL server is running and credentials are correct.")
@@ -104,18 +358,60 @@ def get_database_connection():
         return None
 
 # Function to execute queries with error handling
-def execute_query(query, connection):
-    """Execute SQL query and return results"""
+def execute_query(query, connection, timeout_ms=None, fallback_query=None):
+    """Execute SQL query and return results
+
+    ``connection`` is the ConnectionManager from get_database_connection().
+    The query runs under a statement timeout (``timeout_ms`` or the default,
+    capped by the remaining page budget). If its EXPLAIN cost is over
+    QUERY_COST_BUDGET, ``fallback_query`` runs instead, or the query is refused.
+    """
     try:
         if connection is None:
             st.error("No database connection available")
             return None
-        
-        cursor = connection.cursor()
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        return data
+
+        statement_timeout_ms = None
+
+        # read() may be replayed after a reconnect, so it reports what happened
+        # and the notices are shown once, below
+        def read(conn):
+            nonlocal statement_timeout_ms
+            # Taken with the lock held, so time spent queueing for the shared
+            # connection (and retry backoff) counts against the page budget
+            statement_timeout_ms = effective_timeout_ms(timeout_ms)
+            if statement_timeout_ms <= 0:
+                return 'budget_used_up', None
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SET statement_timeout = %s", (statement_timeout_ms,))
+                cost = estimate_query_cost(query, conn)
+                if cost > QUERY_COST_BUDGET:
+                    if fallback_query is None:
+                        return 'refused', cost
+                    cursor.execute(fallback_query)
+                    return 'approximate', cursor.fetchall()
+                cursor.execute(query)
+                return 'ok', cursor.fetchall()
+            finally:
+                cursor.close()
+
+        status, result = connection.run_read(read)
+        if status == 'budget_used_up':
+            st.warning("⏱️ Page time budget used up, skipping the remaining queries")
+            return None
+        if status == 'refused':
+            st.warning(f"🛑 Query refused: estimated cost {result:,.0f} is over the budget of {QUERY_COST_BUDGET:,.0f}")
+            return None
+        if status == 'approximate':
+            st.info("⚡ Showing an approximate result, the exact query is over the cost budget")
+        return result
+    except psycopg2.extensions.QueryCanceledError:
+        if rerun_requested():
+            # Superseded by a newer rerun; this page is being thrown away
+            return None
+        st.warning(f"⏱️ Query cancelled after {statement_timeout_ms / 1000:.1f}s statement timeout")
+        return None
     except psycopg2.Error as err:
         st.error(f"Query execution failed: {err}")
         return None
@@ -123,6 +419,155 @@ def execute_query(query, connection):
         st.error(f"Unexpected error during query execution: {e}")
         return None
 
+# In-memory aggregate cube (see ecom_cube.py); USE_CUBE=0 queries PostgreSQL directly
+USE_CUBE = os.environ.get('USE_CUBE', '1') == '1'
+DATA_VERSION_TTL_S = 300
+CUBE_BUILD_TIMEOUT_MS = int(os.environ.get('CUBE_BUILD_TIMEOUT_MS', '300000'))
+CUBE_RETRY_BACKOFF_S = 30
+CUBE_MAX_RETRY_BACKOFF_S = 1800
+# The dashboard has no login, so rebuilding from the sidebar is opt-in
+ALLOW_CUBE_REBUILD = os.environ.get('ALLOW_CUBE_REBUILD', '0') == '1'
+
+@st.cache_data(ttl=DATA_VERSION_TTL_S, show_spinner=False)
+def get_data_version(_connection):
+    """Fingerprint of the ECOM tables, re-checked every few minutes"""
+    def read(conn):
+        cursor = conn.cursor()
+        cursor.execute("SET statement_timeout = %s", (DEFAULT_STATEMENT_TIMEOUT_MS,))
+        cursor.close()
+        return ecom_cube.data_version(conn)
+    return _connection.run_read(read)
+
+class CubeLoader:
+    """Builds the cube in a background thread, on a connection of its own.
+
+    Pages never wait for a build: until the cube for the current data version
+    is ready they are answered with SQL. The build doesn't hold the shared
+    connection's lock and, having no script context, isn't cancelled when a
+    page is switched. Failed builds are retried with exponential backoff; if
+    the data breaks the cube's assumptions it isn't retried until the data
+    version changes.
+    """
+
+    def __init__(self, manager, path):
+        self.manager = manager
+        self.path = path
+        self.lock = threading.Lock()
+        self.cube = None
+        self.building = False
+        self.last_error = None
+        self._loaded_version = None
+        self._failed_version = None
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def get(self, version):
+        """The cube for ``version`` if ready, else None (starting a build if needed)"""
+        with self.lock:
+            if self.cube is not None and self.cube.version == version:
+                return self.cube
+            if self._loaded_version != version:
+                # Look at the saved file once per version, e.g. after a restart
+                self._loaded_version = version
+                cube = ecom_cube.load_saved(self.path, version)
+                if cube is not None:
+                    self.cube = cube
+                    return cube
+            if self._failed_version != version or time.monotonic() >= self._retry_at:
+                self._start_build(version)
+            return None
+
+    def rebuild(self, version):
+        """Build the cube for ``version`` again, ignoring the saved file and past failures"""
+        with self.lock:
+            self._loaded_version = version
+            self._failed_version = None
+            self._start_build(version)
+
+    def _start_build(self, version):
+        # Call with ``lock`` held
+        if not self.building:
+            self.building = True
+            threading.Thread(target=self._build, args=(version,), daemon=True).start()
+
+    def _build(self, version):
+        try:
+            self._build_and_save(version)
+        finally:
+            # Whatever happened, let a later get() start another build
+            with self.lock:
+                self.building = False
+
+    def _build_and_save(self, version):
+        conn = None
+        try:
+            conn = psycopg2.connect(*self.manager.connect_args, **self.manager.connect_kwargs)
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("SET statement_timeout = %s", (CUBE_BUILD_TIMEOUT_MS,))
+            cursor.close()
+            cube = ecom_cube.build_cube(conn, version)
+        except Exception as e:
+            logger.warning("Building the cube for data version %s failed: %s", version, e)
+            self._build_failed(version, e)
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        try:
+            cube.save(self.path)
+        except Exception as e:
+            logger.warning("Could not save the cube to %s, keeping it in memory only: %s", self.path, e)
+
+        with self.lock:
+            self.cube = cube
+            self.last_error = None
+            self._failed_version = None
+            self._failures = 0
+
+    def _build_failed(self, version, err):
+        with self.lock:
+            if self._failed_version != version:
+                self._failures = 0
+            self._failed_version = version
+            self._failures += 1
+            if isinstance(err, ecom_cube.CubeAssumptionError):
+                self._retry_at = float('inf')
+            else:
+                backoff = CUBE_RETRY_BACKOFF_S * 2 ** (self._failures - 1)
+                self._retry_at = time.monotonic() + min(backoff, CUBE_MAX_RETRY_BACKOFF_S)
+            self.last_error = str(err)
+
+@st.cache_resource
+def get_cube_loader(_manager):
+    """Cube loader shared by every session"""
+    return CubeLoader(_manager, ecom_cube.CUBE_FILE)
+
+def load_dashboard_cube(connection):
+    """The cube for the current data, or None to fall back to SQL"""
+    if not USE_CUBE:
+        return None
+    try:
+        version = get_data_version(connection)
+    except Exception as e:
+        st.warning(f"🧊 In-memory cube unavailable, querying the database directly: {e}")
+        return None
+
+    loader = get_cube_loader(connection)
+    cube = loader.get(version)
+    if cube is None and loader.building:
+        st.sidebar.info("🧊 Building in-memory cube, answering from SQL meanwhile")
+    elif cube is None and loader.last_error:
+        st.sidebar.caption(f"🧊 In-memory cube unavailable, querying the database directly: {loader.last_error}")
+    return cube
+
+def run_view(view, connection, cube, **query_options):
+    """Rows for a dashboard view: sliced from the cube when loaded, else queried with SQL"""
+    if cube is not None:
+        return cube.answer(view)
+    return execute_query(ecom_cube.VIEW_QUERIES[view], connection, **query_options)
+
 # Main app
 def main():
     st.title("🛒 E-Commerce Data Analysis Dashboard")
@@ -135,12 +580,31 @@ def main():
         st.error("❌ Unable to connect to database. Please check your connection settings.")
         st.info("📝 **Note**: This app requires a PostgreSQL database connection. Make sure your database is running.")
         if st.button("🔄 Try Reconnecting"):
-            st.cache_resource.clear()
+            get_connection_manager().reset()
             st.rerun()
         return
     
     st.success("✅ Connected to database successfully!")
     
+    with st.sidebar.expander("🔌 Connection health"):
+        metrics = db_connection.metrics
+        st.caption(f"Source: {db_connection.source}")
+        st.metric("Reconnects", metrics['reconnects'])
+        if metrics['last_cold_start_ms'] is not None:
+            st.metric("Last connect latency", f"{metrics['last_cold_start_ms']:,.0f} ms")
+            st.metric("Worst connect latency", f"{metrics['max_cold_start_ms']:,.0f} ms")
+        st.caption(f"Read retries: {metrics['read_retries']} · Failed validations: {metrics['failed_validations']} · Keep-warm pings: {metrics['keep_warm_pings']}")
+    
+    cube = load_dashboard_cube(db_connection)
+    if cube is not None:
+        with st.sidebar.expander("🧊 Data cube"):
+            st.caption(f"Version {cube.version}, built {cube.built_at}")
+            st.metric("Memory", f"{cube.nbytes() / 1024:,.1f} KiB")
+            if ALLOW_CUBE_REBUILD and st.button("Rebuild cube"):
+                get_data_version.clear()
+                get_cube_loader(db_connection).rebuild(get_data_version(db_connection))
+                st.rerun()
+    
     # Sidebar navigation
     st.sidebar.title(" Navigation")
     analysis_type = st.sidebar.selectbox(
@@ -153,6 +617,7 @@ def main():
             " Time Series Analysis",
         ]
     )
+    start_page_budget(analysis_type)
     
     if analysis_type == " Overview":
         st.header("Dashboard Overview")
@@ -162,29 +627,25 @@ def main():
         
         with col1:
             # Total customers
-            query = "SELECT COUNT(customer_id) as total_customers FROM customers"
-            result = execute_query(query, db_connection)
+            result = run_view('total_customers', db_connection, cube)
             if result:
                 st.metric("Total Customers", f"{result[0][0]:,}")
         
         with col2:
             # Total unique orders
-            query = "SELECT COUNT(DISTINCT order_id) as total_orders FROM orders"
-            result = execute_query(query, db_connection)
+            result = run_view('unique_orders', db_connection, cube)
             if result:
                 st.metric("Unique Orders", f"{result[0][0]:,}")
         
         with col3:
             # Total order records (including duplicates)
-            query = "SELECT COUNT(*) as total_records FROM orders"
-            result = execute_query(query, db_connection)
+            result = run_view('order_records', db_connection, cube)
             if result:
                 st.metric("Order Records", f"{result[0][0]:,}")
         
         with col4:
             # Total revenue
-            query = "SELECT ROUND(SUM(payment_value)::NUMERIC, 2) as total_revenue FROM payments"
-            result = execute_query(query, db_connection)
+            result = run_view('total_revenue', db_connection, cube)
             if result:
                 st.metric("Total Revenue", f"${result[0][0]:,.2f}")
         
@@ -198,15 +659,13 @@ def main():
         
         with col_a:
             # Customers with orders
-            query = "SELECT COUNT(DISTINCT customer_id) FROM orders"
-            result = execute_query(query, db_connection)
+            result = run_view('active_customers', db_connection, cube)
             if result:
                 st.metric("Active Customers", f"{result[0][0]:,}")
         
         with col_b:
             # Average order value
-            query = "SELECT ROUND(AVG(payment_value)::NUMERIC, 2) FROM payments"
-            result = execute_query(query, db_connection)
+            result = run_view('avg_order_value', db_connection, cube)
             if result:
                 st.metric("Avg Order Value", f"${result[0][0]:,.2f}")
         
@@ -222,14 +681,7 @@ def main():
         st.header("Customer Analysis")
         
         # Customer distribution by state
-        query = """
-        SELECT customer_state, COUNT(*) as customer_count
-        FROM customers
-        GROUP BY customer_state
-        ORDER BY customer_count DESC
-        LIMIT 10
-        """
-        result = execute_query(query, db_connection)
+        result = run_view('customers_by_state', db_connection, cube)
         
         if result:
             df = pd.DataFrame(result, columns=['State', 'Customer Count'])
@@ -250,32 +702,25 @@ def main():
         
         with col1:
             # Unique orders
-            query = "SELECT COUNT(DISTINCT order_id) as total_orders FROM orders"
-            result = execute_query(query, db_connection)
+            result = run_view('unique_orders', db_connection, cube)
             if result:
                 st.metric("Unique Orders", f"{result[0][0]:,}")
         
         with col2:
             # Orders per customer
-            query = """
-            SELECT ROUND((COUNT(DISTINCT order_id) * 1.0 / COUNT(DISTINCT customer_id))::NUMERIC, 2)
-            FROM orders
-            """
-            result = execute_query(query, db_connection)
+            result = run_view('orders_per_customer', db_connection, cube)
             if result:
                 st.metric("Orders per Customer", f"{result[0][0]:.2f}")
         
         with col3:
             # Average order value
-            query = "SELECT ROUND(AVG(payment_value)::NUMERIC, 2) FROM payments"
-            result = execute_query(query, db_connection)
+            result = run_view('avg_order_value', db_connection, cube)
             if result:
                 st.metric("Avg Order Value", f"${result[0][0]:,.2f}")
         
         with col4:
             # Total products
-            query = "SELECT COUNT(DISTINCT product_id) FROM products"
-            result = execute_query(query, db_connection)
+            result = run_view('total_products', db_connection, cube)
             if result:
                 st.metric("Total Products", f"{result[0][0]:,}")
         
@@ -285,18 +730,13 @@ def main():
         
         with col_a:
             # Total order records
-            query = "SELECT COUNT(*) FROM orders"
-            result = execute_query(query, db_connection)
+            result = run_view('order_records', db_connection, cube)
             if result:
                 st.metric("Order Records", f"{result[0][0]:,}")
         
         with col_b:
             # Duplicate factor
-            query = """
-            SELECT ROUND((COUNT(*) * 1.0 / COUNT(DISTINCT order_id))::NUMERIC, 1) as dup_factor 
-            FROM orders
-            """
-            result = execute_query(query, db_connection)
+            result = run_view('duplicate_factor', db_connection, cube)
             if result:
                 st.metric("Duplicate Factor", f"{result[0][0]}x")
         
@@ -304,8 +744,7 @@ def main():
         
         # Orders by status
         st.subheader(" Orders by Status")
-        query = "SELECT order_status, COUNT(DISTINCT order_id) as count FROM orders GROUP BY order_status ORDER BY count DESC"
-        result = execute_query(query, db_connection)
+        result = run_view('orders_by_status', db_connection, cube)
         if result:
             df = pd.DataFrame(result, columns=['Status', 'Count'])
             fig = px.bar(df, x='Status', y='Count', title="Unique Orders by Status")
@@ -314,15 +753,7 @@ def main():
         
         # Orders by month (using distinct orders to avoid duplicates)
         st.subheader("📅 Orders Over Time")
-        query = """
-        SELECT 
-            TO_CHAR(order_purchase_timestamp::TIMESTAMP, 'YYYY-MM') as month,
-            COUNT(DISTINCT order_id) as order_count
-        FROM orders
-        GROUP BY TO_CHAR(order_purchase_timestamp::TIMESTAMP, 'YYYY-MM')
-        ORDER BY month
-        """
-        result = execute_query(query, db_connection)
+        result = run_view('orders_by_month', db_connection, cube)
         
         if result:
             df = pd.DataFrame(result, columns=['Month', 'Order Count'])
@@ -335,18 +766,20 @@ def main():
         st.header("Sales & Revenue Analysis")
         
         # Revenue by product category
-        query = """
+        # Over the cost budget, estimate from a 10% sample of order items
+        approximate_query = """
         SELECT 
             p."product category" as category,
-            ROUND(SUM(pay.payment_value)::NUMERIC, 2) as total_revenue
+            ROUND((SUM(pay.payment_value) * 10)::NUMERIC, 2) as total_revenue
         FROM products p
-        JOIN order_items oi ON p.product_id = oi.product_id
+        JOIN order_items oi TABLESAMPLE SYSTEM (10) REPEATABLE (0) ON p.product_id = oi.product_id
         JOIN payments pay ON oi.order_id = pay.order_id
         GROUP BY p."product category"
         ORDER BY total_revenue DESC
         LIMIT 10
         """
-        result = execute_query(query, db_connection)
+        result = run_view('category_revenue', db_connection, cube, timeout_ms=30000,
+                          fallback_query=approximate_query)
         
         if result:
             df = pd.DataFrame(result, columns=['Category', 'Revenue'])
@@ -362,18 +795,7 @@ def main():
         st.header("Time Series Analysis")
         
         # Monthly revenue trend (using distinct orders)
-        query = """
-        SELECT 
-            TO_CHAR(o.order_purchase_timestamp::TIMESTAMP, 'YYYY-MM') as month,
-            ROUND(SUM(p.payment_value)::NUMERIC, 2) as monthly_revenue,
-            COUNT(DISTINCT o.order_id) as order_count
-        FROM (SELECT DISTINCT order_id, order_purchase_timestamp FROM orders) o
-        JOIN payments p ON o.order_id = p.order_id
-        GROUP BY TO_CHAR(o.order_purchase_timestamp::TIMESTAMP, 'YYYY-MM')
-        ORDER BY month
-        """
-        # st.write("Executing this query:", query)
-        result = execute_query(query, db_connection)
+        result = run_view('monthly_revenue', db_connection, cube)
         
         if result:
             df = pd.DataFrame(result, columns=['Month', 'Revenue', 'Order Count'])